@@ -0,0 +1,26 @@
+"""Shared pytest configuration for WeeKI tests."""
+
+import asyncio
+import atexit
+import os
+import shutil
+import tempfile
+
+try:
+    import uvloop
+except ImportError:  # uvloop is optional (installed with uvicorn[standard])
+    uvloop = None
+
+# Agents simulate work with a sleep; skip it so tests don't wait on fake work.
+# Must be set before weeki.config is imported.
+os.environ.setdefault("WEEKI_SIM_DELAY", "0")
+
+# Tests delete task rows, so never point them at a real database: always use
+# a throwaway file, even when the environment or .env sets a database URL.
+_db_dir = tempfile.mkdtemp(prefix="weeki-tests-")
+atexit.register(shutil.rmtree, _db_dir, ignore_errors=True)
+os.environ["WEEKI_DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'weeki.db')}"
+
+# Run the async tests on the same event loop implementation uvicorn uses
+if uvloop is not None:
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
@@ -2,16 +2,26 @@
 
 import asyncio
 import pytest
+import pytest_asyncio
 from unittest.mock import patch
+from sqlalchemy import delete, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
 
 from weeki.config import settings
-from weeki.database import db_manager
-from weeki.agents import AgentOrchestrator
+from weeki.database import DatabaseManager, db_manager, Task as TaskModel, _migrate
+from weeki.monitoring import system_monitor
+from weeki.server import app
+from weeki.agents import (
+    AgentOrchestrator, OrchestratorAgent, Task,
+    _build_route_matcher, _cached_route_key, _match_route
+)
 
 
-@pytest.fixture
-async def orchestrator():
-    """Create and initialize an orchestrator for testing."""
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def session_orchestrator():
+    """Create and initialize one orchestrator shared by the whole session."""
     # Initialize database
     db_manager.initialize()
     await db_manager.create_tables_async()
@@ -27,7 +37,23 @@ async def orchestrator():
     await db_manager.close()
 
 
-@pytest.mark.asyncio
+@pytest_asyncio.fixture(loop_scope="session")
+async def orchestrator(session_orchestrator):
+    """Shared orchestrator with task state reset before each test."""
+    async with db_manager.get_async_session() as session:
+        await session.execute(delete(TaskModel))
+        await session.commit()
+    
+    # The tasks were deleted behind the orchestrator's back, as another
+    # process would; expire what it cached as if task_cache_ttl had passed
+    session_orchestrator._in_flight.clear()
+    session_orchestrator._finished.clear()
+    session_orchestrator._totals_expire_at = 0.0
+    
+    yield session_orchestrator
+
+
+@pytest.mark.asyncio(loop_scope="session")
 async def test_config_loading():
     """Test configuration loading."""
     assert settings.host == "0.0.0.0"
@@ -35,41 +61,234 @@ async def test_config_loading():
     assert isinstance(settings.max_agents, int)
 
 
-@pytest.mark.asyncio
+@pytest.mark.asyncio(loop_scope="session")
 async def test_database_initialization():
     """Test database initialization."""
-    db_manager.initialize()
-    await db_manager.create_tables_async()
+    # A manager of its own, so the shared db_manager is never closed
+    manager = DatabaseManager()
+    manager.initialize()
+    await manager.create_tables_async()
     
     # Test database connection
-    async with db_manager.get_async_session() as session:
+    async with manager.get_async_session() as session:
         assert session is not None
     
-    await db_manager.close()
+    await manager.close()
 
 
-@pytest.mark.asyncio
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_timestamp_upgrade(tmp_path):
+    """Test converting a tasks table with DATETIME timestamps to epoch seconds."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'old.db'}")
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            "CREATE TABLE tasks (id VARCHAR(36) NOT NULL, directive TEXT NOT NULL, "
+            "context JSON, status VARCHAR(20), message TEXT, result JSON, "
+            "created_at DATETIME, completed_at DATETIME, processing_time FLOAT, "
+            "assigned_agent VARCHAR(100), PRIMARY KEY (id))"
+        ))
+        await conn.execute(text(
+            "INSERT INTO tasks (id, directive, status, created_at, completed_at) "
+            "VALUES ('old', 'Old task', 'completed', "
+            "'2024-01-02 03:04:05.250000', '2024-01-02 03:04:06.000000')"
+        ))
+    
+    # Running the upgrade twice must leave the converted table alone
+    for _ in range(2):
+        async with engine.begin() as conn:
+            await conn.run_sync(_migrate)
+    
+    async with engine.connect() as conn:
+        created_at, completed_at = (await conn.execute(
+            text("SELECT created_at, completed_at FROM tasks WHERE id = 'old'")
+        )).one()
+    await engine.dispose()
+    
+    assert created_at == 1704164645.25
+    assert completed_at == 1704164646.0
+
+
+@pytest.mark.asyncio(loop_scope="session")
 async def test_orchestrator_initialization(orchestrator):
     """Test orchestrator initialization."""
-    assert orchestrator.get_active_agent_count() > 0
+    assert orchestrator.get_active_agent_count() == 8
     assert orchestrator.orchestrator.is_active
+    
+    # Re-initializing an active agent must not inflate the count
+    await orchestrator.orchestrator.utility_agents["formatting"].initialize()
+    assert orchestrator.get_active_agent_count() == 8
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_routing(orchestrator):
+    """Test keyword-based routing of directives to agents."""
+    expected = {
+        "Write a simple Hello World program": "specialist_coding",
+        "Redesign the settings page": "specialist_design",
+        "INVESTIGATE the outage": "specialist_research",
+        "Document the API": "specialist_writing",
+        "Notify the team": "utility_communication",
+        "Hello there": "utility_data_processing",
+        # Keywords also match inside longer words
+        "Programming a parser": "specialist_coding",
+        "Developing the backend": "specialist_coding",
+        "Documentation for the API": "specialist_writing",
+    }
+    for directive, agent_id in expected.items():
+        task = Task(id="routing", directive=directive, context={})
+        agent = orchestrator.orchestrator.route_task(task)
+        assert agent.id == agent_id
+    
+    # Long directives are routed the same way but never cached
+    cached = _cached_route_key.cache_info().currsize
+    task = Task(id="routing", directive="Hello " * 100 + "notify the team", context={})
+    assert orchestrator.orchestrator.route_task(task).id == "utility_communication"
+    assert _cached_route_key.cache_info().currsize == cached
+
 
+def test_route_matcher():
+    """Test substring keyword matching and rule priority."""
+    matcher = _build_route_matcher([
+        ("writing", ("user guide",)),
+        ("design", ("user", "user interface")),
+    ])
+    assert _match_route("polish the user interface", matcher) == (1, "design")
+    assert _match_route("ask a user, then the user guide", matcher) == (0, "writing")
+    assert _match_route("the superuser", matcher) == (1, "design")
+    assert _match_route("guide", matcher) is None
 
-@pytest.mark.asyncio
+
+@pytest.mark.asyncio(loop_scope="session")
 async def test_task_creation(orchestrator):
     """Test task creation and processing."""
     task_id = await orchestrator.create_task("Test task", {"test": True})
     assert task_id is not None
     
-    # Wait a moment for processing
-    await asyncio.sleep(2)
+    task_status = await orchestrator.get_task_status(
+        task_id, await_completion=True, timeout=10
+    )
+    assert task_status is not None
+    assert task_status["status"] == "completed"
     
+    # Finished tasks are dropped from memory and served from the database
+    assert task_id not in orchestrator._in_flight
     task_status = await orchestrator.get_task_status(task_id)
-    assert task_status is not None
-    assert task_status["status"] in ["completed", "in_progress", "pending"]
+    assert task_status["status"] == "completed"
+    assert task_status["context"] == {"test": True}
+    
+    # ...and cached once read back
+    assert await orchestrator.get_task_status(task_id) is task_status
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_large_int_context(orchestrator):
+    """Test that integers beyond 64 bits in the context are stored exactly."""
+    context = {"n": 10 ** 20, "m": -(10 ** 30), "k": -(2 ** 63) - 1}
+    task_id = await orchestrator.create_task("Test task", context)
+    task_status = await orchestrator.get_task_status(
+        task_id, await_completion=True, timeout=10
+    )
+    assert task_status["status"] == "completed"
+    
+    orchestrator._finished.clear()
+    task_status = await orchestrator.get_task_status(task_id)
+    assert task_status["context"] == context
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_creation_for_agent(orchestrator):
+    """Test dispatching a task to an explicitly chosen agent."""
+    task_id = await orchestrator.create_task("Test task", {}, agent="writing")
+    task_status = await orchestrator.get_task_status(
+        task_id, await_completion=True, timeout=10
+    )
+    assert task_status["result"]["processed_by"] == "specialist_writing"
+    
+    with pytest.raises(ValueError):
+        await orchestrator.create_task("Test task", {}, agent="unknown")
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_write_retry(orchestrator):
+    """Test that a failed batch write is retried before tasks are released."""
+    from weeki import agents
+    
+    get_session = db_manager.get_async_session
+    failures = [OSError("disk I/O error")]
+    
+    def flaky_session():
+        if failures:
+            raise failures.pop()
+        return get_session()
+    
+    with patch.object(agents, "WRITE_RETRY_DELAY", 0), \
+            patch.object(db_manager, "get_async_session", flaky_session):
+        task_id = await orchestrator.create_task("Test task")
+        task_status = await orchestrator.get_task_status(
+            task_id, await_completion=True, timeout=10
+        )
+    
+    assert not failures
+    assert task_status["status"] == "completed"
+    assert task_id not in orchestrator._in_flight
+    assert (await orchestrator.get_task_status(task_id))["status"] == "completed"
+    
+    # Totals are recounted after the failure instead of drifting
+    assert (await orchestrator.list_tasks(status_filter="completed"))["total"] == 1
+    assert (await orchestrator.list_tasks(status_filter="pending"))["total"] == 0
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_write_isolation(orchestrator):
+    """Test that an unwritable task row does not drop the rest of its batch."""
+    from weeki import agents
+    
+    with patch.object(agents, "WRITE_RETRY_DELAY", 0):
+        # A set is not JSON serializable, so this row can never be stored
+        bad_id = await orchestrator.create_task("Test task", {"bad": {1, 2}})
+        good_ids = [await orchestrator.create_task("Test task") for _ in range(3)]
+        
+        for task_id in [bad_id, *good_ids]:
+            await orchestrator.get_task_status(task_id, await_completion=True, timeout=10)
+    
+    assert not orchestrator._in_flight
+    assert await orchestrator.get_task_status(bad_id) is None
+    for task_id in good_ids:
+        assert (await orchestrator.get_task_status(task_id))["status"] == "completed"
+    assert (await orchestrator.list_tasks())["total"] == len(good_ids)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_write_split_order(orchestrator):
+    """Test that a split batch never stores a task's writes out of order."""
+    from weeki import agents
+    
+    flush_writes = orchestrator._flush_writes
+    flushed = []
+    
+    async def flaky_flush(batch):
+        flushed.append([op for op, _, _ in batch])
+        # Fail the whole batch and then its first half, as a row error
+        if len(flushed) <= 2:
+            raise TypeError("not serializable")
+        await flush_writes(batch)
+    
+    with patch.object(agents, "WRITE_RETRY_DELAY", 0), \
+            patch.object(agents, "WRITE_BATCH_WINDOW", 0.5), \
+            patch.object(orchestrator, "_flush_writes", flaky_flush):
+        task_id = await orchestrator.create_task("Test task")
+        await orchestrator.get_task_status(task_id, await_completion=True, timeout=10)
+    
+    # The insert and the update were split across the halves; the update
+    # was held back with the failed insert instead of being stored first
+    assert flushed[:3] == [["insert", "update"], ["insert"], ["insert", "update"]]
+    orchestrator._finished.clear()
+    assert (await orchestrator.get_task_status(task_id))["status"] == "completed"
+    assert (await orchestrator.list_tasks(status_filter="completed"))["total"] == 1
+    assert (await orchestrator.list_tasks(status_filter="pending"))["total"] == 0
 
 
-@pytest.mark.asyncio
+@pytest.mark.asyncio(loop_scope="session")
 async def test_task_listing(orchestrator):
     """Test task listing functionality."""
     # Create a few tasks
@@ -79,48 +298,142 @@ async def test_task_listing(orchestrator):
         task_ids.append(task_id)
     
     # Wait for processing
-    await asyncio.sleep(3)
+    for task_id in task_ids:
+        await orchestrator.get_task_status(task_id, await_completion=True, timeout=10)
     
     # List tasks
     task_list = await orchestrator.list_tasks(page=1, per_page=10)
     assert "tasks" in task_list
-    assert task_list["total"] >= 3
+    assert task_list["total"] == 3
+    
+    completed = await orchestrator.list_tasks(status_filter="completed")
+    assert completed["total"] == 3
+    assert (await orchestrator.list_tasks(status_filter="pending"))["total"] == 0
 
 
-if __name__ == "__main__":
-    # Simple test runner for manual testing
-    async def run_tests():
-        print("Running basic WeeKI tests...")
-        
-        print("Testing configuration...")
-        await test_config_loading()
-        print("✓ Configuration test passed")
-        
-        print("Testing database...")
-        await test_database_initialization()
-        print("✓ Database test passed")
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_listing_totals(orchestrator):
+    """Test that cached totals pick up other writers within task_cache_ttl."""
+    with patch.object(settings, "task_cache_ttl", 1):
+        task_id = await orchestrator.create_task("Test task")
+        await orchestrator.get_task_status(task_id, await_completion=True, timeout=10)
         
-        print("Creating orchestrator...")
-        db_manager.initialize()
-        await db_manager.create_tables_async()
-        orch = AgentOrchestrator()
-        await orch.initialize()
+        # Another process deletes the task; the writer's totals still count it
+        async with db_manager.get_async_session() as session:
+            await session.execute(delete(TaskModel))
+            await session.commit()
+        assert (await orchestrator.list_tasks())["total"] == 1
         
-        print("Testing orchestrator...")
-        await test_orchestrator_initialization(orch)
-        print("✓ Orchestrator test passed")
+        # Once they expire, the table is counted again
+        await asyncio.sleep(1.1)
+        assert (await orchestrator.list_tasks())["total"] == 0
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_task_listing_cursor(orchestrator):
+    """Test walking the task list with keyset cursors."""
+    task_ids = [await orchestrator.create_task(f"Test task {i}") for i in range(5)]
+    for task_id in task_ids:
+        await orchestrator.get_task_status(task_id, await_completion=True, timeout=10)
+    
+    seen = []
+    cursor = None
+    while True:
+        page = await orchestrator.list_tasks(per_page=2, cursor=cursor)
+        seen.extend(task["task_id"] for task in page["tasks"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    
+    assert sorted(seen) == sorted(task_ids)
+    
+    with pytest.raises(ValueError):
+        await orchestrator.list_tasks(cursor="not-a-cursor")
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_status_probe(monkeypatch):
+    """Test that backed-off monitoring still refreshes resource readings."""
+    monkeypatch.setattr(system_monitor, "_status_published", None)
+    monkeypatch.setattr(system_monitor, "_latest_status", {"system": None, "tasks": {"total": 1}})
+    
+    await system_monitor._sleep_until_next(0.05, 0.02)
+    
+    status = system_monitor._latest_status
+    assert status["system"]["cpu_percent"] is not None
+    assert status["tasks"] == {"total": 1}
+
+
+def test_unhandled_error_response(monkeypatch):
+    """Test that unhandled endpoint errors become 500s with CORS headers."""
+    async def broken_status():
+        raise RuntimeError("status unavailable")
+    
+    monkeypatch.setattr(system_monitor, "get_system_status", broken_status)
+    response = TestClient(app).get("/status", headers={"Origin": "http://localhost"})
+    
+    assert response.status_code == 500
+    assert response.json() == {"detail": "status unavailable"}
+    assert response.headers["access-control-allow-origin"] == "http://localhost"
+
+
+def test_status_stream(monkeypatch):
+    """Test pushing status snapshots and ending the stream."""
+    # Serve snapshots from memory; the app's lifespan is not started
+    monkeypatch.setattr(system_monitor, "_latest_status", {"tick": 0})
+    monkeypatch.setattr(system_monitor, "_status_published", None)
+    monkeypatch.setattr(system_monitor, "_stop_monitoring", False)
+    client = TestClient(app)
+    
+    # Leaving the block closes the socket; the handler must notice without
+    # waiting for another snapshot
+    with client.websocket_connect("/status/stream") as websocket:
+        assert websocket.receive_json() == {"tick": 0}
+    
+    # Each test connection runs on its own event loop
+    system_monitor._status_published = None
+    with client.websocket_connect("/status/stream") as websocket:
+        assert websocket.receive_json() == {"tick": 0}
+        websocket.portal.call(system_monitor._publish_status, {"tick": 1})
+        assert websocket.receive_json() == {"tick": 1}
         
-        print("Testing task creation...")
-        await test_task_creation(orch)
-        print("✓ Task creation test passed")
+        # Stopping the monitor ends the stream
+        websocket.portal.call(system_monitor.stop_monitoring)
+        with pytest.raises(WebSocketDisconnect):
+            websocket.receive_json()
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_unfinished_tasks(orchestrator):
+    """Test that cancelled submissions and shutdown leave no pending tasks."""
+    orch = AgentOrchestrator()
+    await orch.initialize()
+    
+    async def never_finish(self, task, *args):
+        await asyncio.Event().wait()
+    
+    with patch.object(OrchestratorAgent, "process_task", never_finish), \
+            patch("weeki.agents.SHUTDOWN_DRAIN_TIMEOUT", 0):
+        # Fill the workers and the queue until create_task has to wait
+        created = []
+        while True:
+            try:
+                created.append(await asyncio.wait_for(orch.create_task("Test task"), 1))
+            except asyncio.TimeoutError:
+                break
         
-        print("Testing task listing...")
-        await test_task_listing(orch)
-        print("✓ Task listing test passed")
+        # The submission that timed out was rolled back
+        assert len(orch._in_flight) == len(created)
         
         await orch.shutdown()
-        await db_manager.close()
-        
-        print("All tests passed! ✓")
     
-    asyncio.run(run_tests())
\ No newline at end of file
+    assert not orch._in_flight
+    for task_id in created:
+        task_status = await orch.get_task_status(task_id)
+        assert task_status["status"] == "failed"
+        assert task_status["message"] == "Interrupted by shutdown"
+    
+    # Shutting down again has nothing left to wait for
+    await asyncio.wait_for(orch.shutdown(), 1)
+    with pytest.raises(RuntimeError):
+        await orch.create_task("Test task")
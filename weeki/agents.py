@@ -1,12 +1,23 @@
 """Agent orchestration system for WeeKI."""
 
 import asyncio
+import functools
 import logging
+import re
+import sys
+import time
 import uuid
-from typing import Dict, Any, Optional
+from collections import OrderedDict
+from typing import Callable, Dict, Any, List, Optional, Pattern, Set, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
-from datetime import datetime
+from sqlalchemy import Insert, select, func, desc, tuple_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import DataError, DBAPIError, IntegrityError, StatementError
+
+from .config import settings
+from .database import db_manager, format_timestamp, Task as TaskModel
 
 
 class AgentType(Enum):
@@ -24,37 +35,243 @@ class TaskStatus(Enum):
     FAILED = "failed"
 
 
-@dataclass
+# Bound once so the per-task path skips Enum attribute and .value lookups
+_PENDING, _IN_PROGRESS, _COMPLETED, _FAILED = (
+    TaskStatus.PENDING, TaskStatus.IN_PROGRESS, TaskStatus.COMPLETED, TaskStatus.FAILED
+)
+_STATUS_VALUE = {status: status.value for status in TaskStatus}
+_FINAL_STATUS_VALUES = frozenset((_COMPLETED.value, _FAILED.value))
+
+
+# Routing rules in priority order: (agent key, keywords). A directive is sent
+# to the agent of the first rule with a keyword occurring anywhere in it,
+# inside longer words too ("programming", "redesign").
+ROUTING_RULES: List[Tuple[str, Tuple[str, ...]]] = [
+    ("coding", ("code", "program", "develop", "build")),
+    ("design", ("design", "ui", "visual", "interface")),
+    ("research", ("research", "analyze", "study", "investigate")),
+    ("writing", ("write", "document", "text", "content")),
+    ("data_processing", ("format", "process", "convert")),
+    ("communication", ("communicate", "send", "notify")),
+]
+DEFAULT_ROUTE = "data_processing"
+ROUTE_CACHE_SIZE = 2048
+# Longer directives are routed without the cache, so it never holds on to
+# large task bodies
+ROUTE_CACHE_MAX_LENGTH = 256
+
+# Seconds shutdown waits for queued tasks to finish before interrupting them
+SHUTDOWN_DRAIN_TIMEOUT = 10
+
+# Task rows are written to the database in batches of up to this many
+# operations, collected for at most this many seconds
+WRITE_BATCH_SIZE = 100
+WRITE_BATCH_WINDOW = 0.05
+# A batch with rows that cannot be stored is split up to isolate them.
+# Writes that fail to commit are retried this many times, waiting a little
+# longer before each attempt, before they are given up on
+WRITE_MAX_ATTEMPTS = 5
+WRITE_RETRY_DELAY = 0.5
+
+
+RouteMatcher = Tuple[Pattern[str], Dict[str, Tuple[int, str]]]
+
+
+def _build_route_matcher(rules: List[Tuple[str, Tuple[str, ...]]]) -> RouteMatcher:
+    """Compile routing keywords into a single pattern.
+    
+    Keywords match anywhere in the lowercased directive, inside longer words
+    too. Each keyword maps to the (rule priority, agent key) of the first
+    rule that lists it.
+    """
+    routes: Dict[str, Tuple[int, str]] = {}
+    for priority, (key, keywords) in enumerate(rules):
+        for keyword in keywords:
+            routes.setdefault(keyword.lower(), (priority, key))
+    
+    # A lookahead reports a keyword at every position, overlapping ones
+    # included; listing earlier rules first makes each position report its
+    # highest-priority keyword
+    alternatives = sorted(routes, key=lambda keyword: routes[keyword][0])
+    pattern = re.compile("(?=(%s))" % "|".join(map(re.escape, alternatives)))
+    return pattern, routes
+
+
+def _match_route(text: str, matcher: RouteMatcher) -> Optional[Tuple[int, str]]:
+    """Find the highest-priority keyword occurring in a lowercased directive."""
+    pattern, routes = matcher
+    best = None
+    for match in pattern.finditer(text):
+        hit = routes[match.group(1)]
+        if best is None or hit[0] < best[0]:
+            best = hit
+            if best[0] == 0:
+                break
+    return best
+
+
+_ROUTE_MATCHER = _build_route_matcher(ROUTING_RULES)
+
+
+def _scan_route_key(directive: str) -> str:
+    """Match a directive against the routing keywords."""
+    best = _match_route(directive.lower(), _ROUTE_MATCHER)
+    
+    # Default to general utility agent
+    return best[1] if best is not None else DEFAULT_ROUTE
+
+
+_cached_route_key = functools.lru_cache(maxsize=ROUTE_CACHE_SIZE)(_scan_route_key)
+
+
+def _route_key(directive: str) -> str:
+    """Return the key of the agent a directive should be routed to.
+    
+    Routing is a pure function of the directive text, so repeated short
+    directives are answered from the cache without re-scanning.
+    """
+    if len(directive) > ROUTE_CACHE_MAX_LENGTH:
+        return _scan_route_key(directive)
+    return _cached_route_key(directive)
+
+
+def _encode_cursor(created_at: float, task_id: str) -> str:
+    """Encode the sort key of the last listed task as a pagination cursor."""
+    return f"{created_at!r}|{task_id}"
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, str]:
+    """Decode a cursor produced by ``_encode_cursor``."""
+    created_at, sep, task_id = cursor.partition("|")
+    if not sep or not task_id:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return float(created_at), task_id
+
+
+# list_tasks rows, shaped as the API's task response fields
+_TASK_LIST_FIELDS = (
+    "task_id", "status", "message", "result",
+    "created_at", "completed_at", "processing_time"
+)
+_TASK_LIST_COLUMNS = (
+    TaskModel.id, TaskModel.status, TaskModel.message, TaskModel.result,
+    TaskModel.created_at, TaskModel.completed_at, TaskModel.processing_time
+)
+
+
+# dataclass(slots=True) is only available on Python 3.10+
+_DATACLASS_SLOTS: Dict[str, Any] = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_DATACLASS_SLOTS)
 class Task:
     """Task data structure."""
     id: str
     directive: str
     context: Dict[str, Any]
-    status: TaskStatus = TaskStatus.PENDING
+    status: TaskStatus = _PENDING
     result: Dict[str, Any] = field(default_factory=dict)
     message: str = ""
-    created_at: float = field(default_factory=lambda: asyncio.get_event_loop().time())
+    # Wall-clock epoch seconds; rendered as ISO strings only for API output
+    created_at: float = field(default_factory=time.time)
     completed_at: Optional[float] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False, compare=False)
+
+
+def _task_row(task: Task, processing_time: Optional[float] = None) -> Dict[str, Any]:
+    """Full column values for a task's row in the ``tasks`` table."""
+    return {
+        "id": task.id,
+        "directive": task.directive,
+        "context": task.context,
+        "status": _STATUS_VALUE[task.status],
+        "message": task.message,
+        "result": task.result,
+        "created_at": task.created_at,
+        "completed_at": task.completed_at,
+        "processing_time": processing_time
+    }
+
+
+_UPSERT_INSERTS: Dict[str, Callable[..., Any]] = {
+    "sqlite": sqlite_insert, "postgresql": postgresql_insert
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _task_upsert(dialect_name: str) -> Insert:
+    """INSERT ... ON CONFLICT (id) DO UPDATE statement for task rows."""
+    try:
+        insert = _UPSERT_INSERTS[dialect_name]
+    except KeyError:
+        raise ValueError(f"Task upserts are not supported on {dialect_name!r}") from None
+    stmt = insert(TaskModel)
+    # Creation time is fixed by the first write
+    return stmt.on_conflict_do_update(
+        index_elements=[TaskModel.id],
+        set_={
+            column.name: stmt.excluded[column.name]
+            for column in TaskModel.__table__.columns
+            if column.name not in ("id", "created_at")
+        }
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _task_insert(dialect_name: str) -> Insert:
+    """INSERT ... ON CONFLICT (id) DO NOTHING statement for new task rows.
+    
+    A retried insert must never overwrite a task's later state.
+    """
+    return _UPSERT_INSERTS[dialect_name](TaskModel).on_conflict_do_nothing(
+        index_elements=[TaskModel.id]
+    )
+
+
+def _is_row_error(error: BaseException) -> bool:
+    """Whether a failed write is down to the rows written, not the database.
+    
+    Only such failures are worth splitting a batch for; an unavailable or
+    locked database fails every row alike.
+    """
+    if isinstance(error, (IntegrityError, DataError)):
+        return True
+    if isinstance(error, DBAPIError):
+        return False
+    # Parameters that could not be bound or serialized
+    return isinstance(error, (StatementError, TypeError, ValueError))
 
 
 class BaseAgent:
     """Base agent class."""
     
+    __slots__ = ("id", "type", "logger", "is_active", "on_active_change")
+    
     def __init__(self, agent_id: str, agent_type: AgentType):
         self.id = agent_id
         self.type = agent_type
         self.logger = logging.getLogger(f"agent.{agent_id}")
         self.is_active = False
+        # Called with +1/-1 whenever is_active flips
+        self.on_active_change: Optional[Callable[[int], None]] = None
     
     async def initialize(self):
         """Initialize the agent."""
         self.logger.info(f"Initializing {self.type.value} agent: {self.id}")
-        self.is_active = True
+        self._set_active(True)
     
     async def shutdown(self):
         """Shutdown the agent."""
         self.logger.info(f"Shutting down {self.type.value} agent: {self.id}")
-        self.is_active = False
+        self._set_active(False)
+    
+    def _set_active(self, active: bool) -> None:
+        """Update the active flag, notifying the listener on actual changes."""
+        if active == self.is_active:
+            return
+        self.is_active = active
+        if self.on_active_change:
+            self.on_active_change(1 if active else -1)
     
     async def process_task(self, task: Task) -> Task:
         """Process a task. To be implemented by subclasses."""
@@ -64,25 +281,29 @@ class BaseAgent:
 class UtilityAgent(BaseAgent):
     """Utility agent for routine tasks."""
     
-    def __init__(self, agent_id: str, specialty: str = "general"):
+    __slots__ = ("specialty", "sim_delay")
+    
+    def __init__(self, agent_id: str, specialty: str = "general", sim_delay: float = 1.0):
         super().__init__(agent_id, AgentType.UTILITY)
         self.specialty = specialty
+        self.sim_delay = sim_delay
     
     async def process_task(self, task: Task) -> Task:
         """Process utility tasks."""
-        self.logger.info(f"Processing utility task: {task.id}")
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("Processing utility task: %s", task.id)
         
         # Simulate processing
-        await asyncio.sleep(1)
+        await asyncio.sleep(self.sim_delay)
         
-        task.status = TaskStatus.COMPLETED
+        task.status = _COMPLETED
         task.message = f"Utility task processed by {self.specialty} agent"
         task.result = {
             "processed_by": self.id,
             "specialty": self.specialty,
             "original_directive": task.directive
         }
-        task.completed_at = asyncio.get_event_loop().time()
+        task.completed_at = time.time()
         
         return task
 
@@ -90,18 +311,24 @@ class UtilityAgent(BaseAgent):
 class SpecialistAgent(BaseAgent):
     """Specialist agent for domain-specific tasks."""
     
-    def __init__(self, agent_id: str, domain: str):
+    __slots__ = ("domain", "sim_delay")
+    
+    def __init__(self, agent_id: str, domain: str, sim_delay: float = 2.0):
         super().__init__(agent_id, AgentType.SPECIALIST)
         self.domain = domain
+        self.sim_delay = sim_delay
     
     async def process_task(self, task: Task) -> Task:
         """Process specialist tasks."""
-        self.logger.info(f"Processing specialist task in domain {self.domain}: {task.id}")
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(
+                "Processing specialist task in domain %s: %s", self.domain, task.id
+            )
         
         # Simulate more complex processing
-        await asyncio.sleep(2)
+        await asyncio.sleep(self.sim_delay)
         
-        task.status = TaskStatus.COMPLETED
+        task.status = _COMPLETED
         task.message = f"Specialist task completed in domain: {self.domain}"
         task.result = {
             "processed_by": self.id,
@@ -109,7 +336,7 @@ class SpecialistAgent(BaseAgent):
             "analysis": f"Domain-specific analysis for: {task.directive}",
             "recommendations": ["recommendation_1", "recommendation_2"]
         }
-        task.completed_at = asyncio.get_event_loop().time()
+        task.completed_at = time.time()
         
         return task
 
@@ -117,92 +344,112 @@ class SpecialistAgent(BaseAgent):
 class OrchestratorAgent(BaseAgent):
     """Orchestrator agent that coordinates other agents."""
     
+    __slots__ = (
+        "specialist_agents", "utility_agents", "_agents", "_active_count"
+    )
+    
     def __init__(self):
         super().__init__("orchestrator", AgentType.ORCHESTRATOR)
         self.specialist_agents: Dict[str, SpecialistAgent] = {}
         self.utility_agents: Dict[str, UtilityAgent] = {}
+        self._agents: Dict[str, BaseAgent] = {}
+        self._active_count = 0
+        self.on_active_change = self._track_active
+    
+    def _track_active(self, delta: int) -> None:
+        """Keep a live tally of active agents, including the orchestrator."""
+        self._active_count += delta
     
     async def initialize(self):
         """Initialize orchestrator and sub-agents."""
         await super().initialize()
         
-        # Initialize specialist agents
-        for domain in ["coding", "design", "research", "writing"]:
-            agent = SpecialistAgent(f"specialist_{domain}", domain)
-            await agent.initialize()
-            self.specialist_agents[domain] = agent
+        # Override the agents' simulated work time when configured
+        delay = {} if settings.sim_delay is None else {"sim_delay": settings.sim_delay}
+        
+        self.specialist_agents = {
+            domain: SpecialistAgent(f"specialist_{domain}", domain, **delay)
+            for domain in ("coding", "design", "research", "writing")
+        }
+        self.utility_agents = {
+            specialty: UtilityAgent(f"utility_{specialty}", specialty, **delay)
+            for specialty in ("data_processing", "formatting", "communication")
+        }
         
-        # Initialize utility agents
-        for specialty in ["data_processing", "formatting", "communication"]:
-            agent = UtilityAgent(f"utility_{specialty}", specialty)
-            await agent.initialize()
-            self.utility_agents[specialty] = agent
+        # Sub-agents are independent, so bring them up concurrently
+        sub_agents = self._sub_agents()
+        for agent in sub_agents:
+            agent.on_active_change = self._track_active
+        await asyncio.gather(*(agent.initialize() for agent in sub_agents))
+        
+        self._build_router()
+    
+    def _build_router(self) -> None:
+        """Index the initialized sub-agents by their routing key."""
+        self._agents = {**self.specialist_agents, **self.utility_agents}
     
     async def shutdown(self):
         """Shutdown orchestrator and all sub-agents."""
-        # Shutdown specialist agents
-        for agent in self.specialist_agents.values():
-            await agent.shutdown()
-        
-        # Shutdown utility agents
-        for agent in self.utility_agents.values():
-            await agent.shutdown()
-        
+        sub_agents = self._sub_agents()
+        results = await asyncio.gather(
+            *(agent.shutdown() for agent in sub_agents), return_exceptions=True
+        )
+        # One failing agent must not keep the others (or us) running
+        for agent, result in zip(sub_agents, results):
+            if isinstance(result, Exception):
+                self.logger.error(f"Error shutting down agent {agent.id}: {result}")
         await super().shutdown()
     
+    def _sub_agents(self) -> List[BaseAgent]:
+        """All specialist and utility agents."""
+        return [*self.specialist_agents.values(), *self.utility_agents.values()]
+    
     def get_active_agent_count(self) -> int:
         """Get the number of active agents."""
-        count = 1 if self.is_active else 0  # Self
-        count += sum(1 for agent in self.specialist_agents.values() if agent.is_active)
-        count += sum(1 for agent in self.utility_agents.values() if agent.is_active)
-        return count
+        return self._active_count
     
-    async def route_task(self, task: Task) -> BaseAgent:
+    def get_agent(self, key: str) -> Optional[BaseAgent]:
+        """Look up a sub-agent by its domain or specialty key."""
+        return self._agents.get(key)
+    
+    def route_task(self, task: Task) -> BaseAgent:
         """Route task to appropriate agent based on directive analysis."""
-        directive_lower = task.directive.lower()
-        
-        # Simple routing logic based on keywords
-        if any(keyword in directive_lower for keyword in ["code", "program", "develop", "build"]):
-            return self.specialist_agents.get("coding")
-        elif any(keyword in directive_lower for keyword in ["design", "ui", "visual", "interface"]):
-            return self.specialist_agents.get("design")
-        elif any(keyword in directive_lower for keyword in ["research", "analyze", "study", "investigate"]):
-            return self.specialist_agents.get("research")
-        elif any(keyword in directive_lower for keyword in ["write", "document", "text", "content"]):
-            return self.specialist_agents.get("writing")
-        elif any(keyword in directive_lower for keyword in ["format", "process", "convert"]):
-            return self.utility_agents.get("data_processing")
-        elif any(keyword in directive_lower for keyword in ["communicate", "send", "notify"]):
-            return self.utility_agents.get("communication")
-        else:
-            # Default to general utility agent
-            return self.utility_agents.get("data_processing")
+        return self._agents[_route_key(task.directive)]
     
-    async def process_task(self, task: Task) -> Task:
-        """Process task by routing to appropriate agent."""
-        self.logger.info(f"Orchestrating task: {task.id}")
+    async def process_task(self, task: Task, forced_agent: Optional[str] = None) -> Task:
+        """Process task by routing to appropriate agent.
+        
+        If ``forced_agent`` names a sub-agent, routing is skipped and the task
+        goes straight to that agent.
+        """
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("Orchestrating task: %s", task.id)
         
         try:
-            task.status = TaskStatus.IN_PROGRESS
+            task.status = _IN_PROGRESS
             
             # Route to appropriate agent
-            agent = await self.route_task(task)
+            if forced_agent:
+                agent = self.get_agent(forced_agent)
+            else:
+                agent = self.route_task(task)
             if not agent:
-                task.status = TaskStatus.FAILED
+                task.status = _FAILED
                 task.message = "No suitable agent found for task"
                 return task
             
             # Process with selected agent
             result_task = await agent.process_task(task)
             
-            self.logger.info(f"Task {task.id} completed by agent {agent.id}")
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info("Task %s completed by agent %s", task.id, agent.id)
             return result_task
             
         except Exception as e:
             self.logger.error(f"Error processing task {task.id}: {str(e)}")
-            task.status = TaskStatus.FAILED
+            task.status = _FAILED
             task.message = f"Processing error: {str(e)}"
-            task.completed_at = asyncio.get_event_loop().time()
+            task.completed_at = time.time()
             return task
 
 
@@ -211,154 +458,387 @@ class AgentOrchestrator:
     
     def __init__(self):
         self.orchestrator = OrchestratorAgent()
-        self.tasks: Dict[str, Task] = {}
+        # The database is the task store. Only tasks this process is still
+        # working on are held here, so their completion can be awaited.
+        self._in_flight: Dict[str, Task] = {}
+        # Bounded TTL/LRU of finished tasks read back from the database,
+        # mapping task id -> (expiry on the monotonic clock, status)
+        self._finished: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # Stored task count per status. Only the database writer changes it:
+        # it is recounted inside a write transaction at most every
+        # task_cache_ttl seconds and adjusted after the batches in between.
+        # None until counted or after a failed batch.
+        self._task_totals: Optional[Dict[str, int]] = None
+        # When the totals must be recounted, on the monotonic clock
+        self._totals_expire_at = 0.0
         self.logger = logging.getLogger("orchestrator")
+        self._queue: "Optional[asyncio.Queue[Tuple[Task, Optional[str]]]]" = None
+        self._workers: List[asyncio.Task] = []
+        self._write_queue: "Optional[asyncio.Queue[Tuple[str, Task, Dict[str, Any]]]]" = None
+        self._writer: Optional[asyncio.Task] = None
     
     async def initialize(self):
         """Initialize the orchestrator system."""
         self.logger.info("Initializing agent orchestrator system")
+        # Task writes only go through upserts; refuse to start on a database
+        # they cannot be written to instead of dropping every batch later
+        _task_upsert(db_manager.async_engine.dialect.name)
         await self.orchestrator.initialize()
+        
+        # Bounded queue gives back-pressure to create_task under load
+        self._queue = asyncio.Queue(maxsize=settings.max_agents * 4)
+        self._workers = [
+            asyncio.create_task(self._worker(self._queue)) for _ in range(settings.max_agents)
+        ]
+        
+        self._write_queue = asyncio.Queue()
+        self._writer = asyncio.create_task(self._db_writer_loop(self._write_queue))
     
     async def shutdown(self):
-        """Shutdown the orchestrator system."""
+        """Shutdown the orchestrator system.
+        
+        Queued tasks get ``SHUTDOWN_DRAIN_TIMEOUT`` seconds to finish. Any
+        still queued or running after that are stored as failed.
+        """
         self.logger.info("Shutting down agent orchestrator system")
+        if self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=SHUTDOWN_DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.logger.warning(
+                    f"Tasks still running after {SHUTDOWN_DRAIN_TIMEOUT}s; interrupting them"
+                )
+        
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        
+        # Tasks that never reached a worker
+        while self._queue is not None and not self._queue.empty():
+            task, _ = self._queue.get_nowait()
+            self._interrupt(task)
+            # Never started, so no processing time is recorded
+            self._update_task_in_db(task, 0)
+            self._queue.task_done()
+        
+        # Flush whatever the workers left behind before stopping the writer
+        if self._writer:
+            await self._write_queue.join()
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+        
+        # Nothing serves these any more; create_task refuses new tasks
+        self._queue = None
+        self._write_queue = None
+        
         await self.orchestrator.shutdown()
     
+    def _interrupt(self, task: Task) -> None:
+        """Mark a task that shutdown stopped before it finished as failed."""
+        task.status = _FAILED
+        task.message = "Interrupted by shutdown"
+        task.completed_at = time.time()
+    
+    async def _worker(self, queue: "asyncio.Queue[Tuple[Task, Optional[str]]]") -> None:
+        """Pull batches of queued tasks and process them concurrently."""
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < settings.task_batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            
+            try:
+                await asyncio.gather(
+                    *(self._process_task(task, agent) for task, agent in batch)
+                )
+            finally:
+                for _ in batch:
+                    queue.task_done()
+    
+    async def _db_writer_loop(
+        self, write_queue: "asyncio.Queue[Tuple[str, Task, Dict[str, Any]]]"
+    ) -> None:
+        """Collect queued task writes and commit them in batches."""
+        batch: List[Tuple[str, Task, Dict[str, Any]]] = []
+        # Writes taken off the queue that are not yet stored or dropped
+        taken = 0
+        failures = 0
+        while True:
+            if not batch:
+                batch.append(await write_queue.get())
+                taken += 1
+                
+                # Give concurrent tasks a moment to queue their writes as well
+                if write_queue.empty():
+                    await asyncio.sleep(WRITE_BATCH_WINDOW)
+            while len(batch) < WRITE_BATCH_SIZE and not write_queue.empty():
+                batch.append(write_queue.get_nowait())
+                taken += 1
+            
+            batch = await self._flush_isolating(batch)
+            if batch:
+                failures += 1
+                if failures < WRITE_MAX_ATTEMPTS:
+                    # Keep the failed writes ahead of newer ones and try again
+                    await asyncio.sleep(WRITE_RETRY_DELAY * failures)
+                    continue
+                for op, task, _ in batch:
+                    self.logger.error(
+                        f"Dropping {op} of task {task.id} after {failures} failed attempts"
+                    )
+                self._release_finished(batch)
+                batch = []
+            failures = 0
+            
+            for _ in range(taken):
+                write_queue.task_done()
+            taken = 0
+    
+    async def _flush_isolating(
+        self, batch: List[Tuple[str, Task, Dict[str, Any]]]
+    ) -> List[Tuple[str, Task, Dict[str, Any]]]:
+        """Write a batch, splitting it up if some of its rows cannot be stored.
+        
+        A row that can never be written only fails the half it ends up in,
+        so the rest of the batch is still stored. A later write for a task
+        whose earlier write failed is held back with it, so the two are
+        never stored out of order. Failures that are not down to the rows
+        fail the whole batch. Returns the writes that could not be
+        committed, in batch order.
+        """
+        try:
+            await self._flush_writes(batch)
+            return []
+        except Exception as e:
+            # The stored status of these tasks is no longer known; recount
+            self._task_totals = None
+            if len(batch) == 1:
+                op, task, _ = batch[0]
+                self.logger.error(f"Failed to write {op} of task {task.id}: {e}")
+                return batch
+            if not _is_row_error(e):
+                self.logger.error(f"Failed to write tasks to database: {e}")
+                return batch
+        
+        middle = len(batch) // 2
+        failed = await self._flush_isolating(batch[:middle])
+        failed_ids = {task.id for _, task, _ in failed}
+        held = [write for write in batch[middle:] if write[1].id in failed_ids]
+        rest = [write for write in batch[middle:] if write[1].id not in failed_ids]
+        if rest:
+            failed += await self._flush_isolating(rest)
+        
+        unwritten = {id(write) for write in failed + held}
+        return [write for write in batch if id(write) in unwritten]
+    
+    async def _flush_writes(self, batch: List[Tuple[str, Task, Dict[str, Any]]]) -> None:
+        """Apply a batch of task writes in a single transaction.
+        
+        Raises whatever prevented the batch from being committed.
+        """
+        # Later writes for the same task supersede earlier ones in the batch
+        rows = {task.id: row for _, task, row in batch}
+        # Stored status of each task before this batch; None for new rows
+        previous: Dict[str, Optional[str]] = {}
+        # Tasks with a final state in the batch; their rows are upserted
+        updated: Set[str] = set()
+        for op, task, _ in batch:
+            previous.setdefault(task.id, None if op == "insert" else _PENDING.value)
+            if op == "update":
+                updated.add(task.id)
+        
+        totals = self._task_totals
+        # Recount now and then so writes from other processes are picked up
+        recount = totals is None or time.monotonic() >= self._totals_expire_at
+        async with db_manager.get_async_session() as session:
+            dialect_name = session.bind.dialect.name
+            inserts = [row for task_id, row in rows.items() if task_id not in updated]
+            if inserts:
+                await session.execute(_task_insert(dialect_name), inserts)
+            if updated:
+                await session.execute(
+                    _task_upsert(dialect_name), [rows[task_id] for task_id in updated]
+                )
+            
+            if recount:
+                # Count the stored rows, this batch included, in the same transaction
+                result = await session.execute(
+                    select(TaskModel.status, func.count(TaskModel.id)).group_by(TaskModel.status)
+                )
+                counted = dict(result.all())
+            await session.commit()
+        
+        if recount:
+            totals = counted
+            self._totals_expire_at = time.monotonic() + settings.task_cache_ttl
+        else:
+            assert totals is not None
+            for task_id, row in rows.items():
+                old_status = previous[task_id]
+                if old_status is not None:
+                    totals[old_status] = totals.get(old_status, 0) - 1
+                totals[row["status"]] = totals.get(row["status"], 0) + 1
+        self._task_totals = totals
+        
+        self._release_finished(batch)
+    
+    def _release_finished(self, batch: List[Tuple[str, Task, Dict[str, Any]]]) -> None:
+        """Stop tracking the finished tasks of a batch that is no longer pending."""
+        # Finished tasks are only released once their final state is stored
+        for op, task, _ in batch:
+            if op == "update":
+                self._in_flight.pop(task.id, None)
+                task.done.set()
+    
     def get_active_agent_count(self) -> int:
         """Get the number of active agents."""
         return self.orchestrator.get_active_agent_count()
     
-    async def create_task(self, directive: str, context: Dict[str, Any] = None) -> str:
-        """Create a new task and return its ID."""
-        task_id = str(uuid.uuid4())
+    async def create_task(
+        self,
+        directive: str,
+        context: Dict[str, Any] = None,
+        *,
+        agent: Optional[str] = None
+    ) -> str:
+        """Create a new task and return its ID.
+        
+        Callers that already know which sub-agent should handle the task can
+        pass its key (e.g. ``"coding"``) as ``agent`` to skip routing.
+        """
+        if agent is not None and self.orchestrator.get_agent(agent) is None:
+            raise ValueError(f"Unknown agent: {agent}")
+        if self._queue is None or self._write_queue is None:
+            raise RuntimeError("The orchestrator is not running")
+        
+        task_id = uuid.uuid4().hex
         task = Task(
             id=task_id,
             directive=directive,
             context=context or {}
         )
         
-        self.tasks[task_id] = task
-        self.logger.info(f"Created task {task_id}: {directive}")
+        # Hand off to the worker pool; waits if the queue is full. Nothing
+        # else is recorded until the task has a slot, so a caller that gives
+        # up while waiting leaves no pending task behind.
+        await self._queue.put((task, agent))
         
-        # Store in database
-        try:
-            from .database import db_manager, Task as TaskModel
-            async with db_manager.get_async_session() as session:
-                db_task = TaskModel(
-                    id=task_id,
-                    directive=directive,
-                    context=context or {},
-                    status=task.status.value,
-                    message=task.message,
-                    result=task.result,
-                    created_at=datetime.fromtimestamp(task.created_at)
-                )
-                session.add(db_task)
-                await session.commit()
-        except Exception as e:
-            self.logger.error(f"Failed to save task to database: {e}")
-        
-        # Process task asynchronously
-        asyncio.create_task(self._process_task(task))
+        # No await from here on: the task is tracked and its insert queued
+        # before a worker can pick it up and queue its update
+        self._in_flight[task_id] = task
+        self._write_queue.put_nowait(("insert", task, _task_row(task)))
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("Created task %s: %s", task_id, directive)
         
         return task_id
     
-    async def _process_task(self, task: Task):
+    async def _process_task(self, task: Task, agent: Optional[str] = None) -> None:
         """Internal method to process a task."""
-        start_time = asyncio.get_event_loop().time()
+        start_time = time.monotonic()
         try:
-            processed_task = await self.orchestrator.process_task(task)
-            self.tasks[task.id] = processed_task
+            # Agents update the task in place
+            await self.orchestrator.process_task(task, agent)
             
             # Update database
-            await self._update_task_in_db(processed_task, start_time)
+            self._update_task_in_db(task, time.monotonic() - start_time)
             
         except Exception as e:
             self.logger.error(f"Error in task processing: {str(e)}")
-            task.status = TaskStatus.FAILED
+            task.status = _FAILED
             task.message = f"Internal error: {str(e)}"
-            task.completed_at = asyncio.get_event_loop().time()
+            task.completed_at = time.time()
             
             # Update database
-            await self._update_task_in_db(task, start_time)
+            self._update_task_in_db(task, time.monotonic() - start_time)
+        except asyncio.CancelledError:
+            # Shutdown cut the task off; store it as failed, not pending
+            self._interrupt(task)
+            self._update_task_in_db(task, time.monotonic() - start_time)
+            raise
     
-    async def _update_task_in_db(self, task: Task, start_time: float):
-        """Update task in database."""
-        try:
-            from .database import db_manager, Task as TaskModel
-            from sqlalchemy import select
-            from datetime import datetime
-            
-            processing_time = None
-            if task.completed_at:
-                processing_time = task.completed_at - start_time
-            
-            async with db_manager.get_async_session() as session:
-                # Get existing task
-                result = await session.execute(
-                    select(TaskModel).where(TaskModel.id == task.id)
-                )
-                db_task = result.scalar_one_or_none()
-                
-                if db_task:
-                    db_task.status = task.status.value
-                    db_task.message = task.message
-                    db_task.result = task.result
-                    if task.completed_at:
-                        db_task.completed_at = datetime.fromtimestamp(task.completed_at)
-                    if processing_time:
-                        db_task.processing_time = processing_time
-                    
-                    await session.commit()
-                    
-        except Exception as e:
-            self.logger.error(f"Failed to update task in database: {e}")
+    def _update_task_in_db(self, task: Task, elapsed: float) -> None:
+        """Queue the final state of a processed task for the database writer."""
+        assert self._write_queue is not None, "queued tasks imply an initialized writer"
+        # Only tasks that actually finished report a processing time
+        processing_time = (elapsed or None) if task.completed_at else None
+        self._write_queue.put_nowait(("update", task, _task_row(task, processing_time)))
     
-    async def list_tasks(self, page: int = 1, per_page: int = 10, status_filter: str = None) -> Dict[str, Any]:
-        """List tasks with pagination."""
+    def _cached_total(self, status_filter: Optional[str] = None) -> Optional[int]:
+        """Stored task count from the writer's totals.
+        
+        None if they are not loaded or older than ``task_cache_ttl``.
+        """
+        totals = self._task_totals
+        if totals is None or time.monotonic() >= self._totals_expire_at:
+            return None
+        if status_filter:
+            return totals.get(status_filter, 0)
+        return sum(totals.values())
+    
+    async def list_tasks(
+        self,
+        page: int = 1,
+        per_page: int = 10,
+        status_filter: str = None,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """List tasks with pagination, newest first.
+        
+        Each task is a dict keyed by ``_TASK_LIST_FIELDS``.
+        
+        Pages are selected by ``page`` (OFFSET) unless a ``cursor`` from a
+        previous result's ``next_cursor`` is given. Cursor pagination seeks
+        straight to the next rows, so deep pages cost the same as the first.
+        Raises ``ValueError`` for a malformed cursor.
+        """
+        seek = _decode_cursor(cursor) if cursor else None
+        
         try:
-            from .database import db_manager, Task as TaskModel
-            from sqlalchemy import select, func, desc
-            
             async with db_manager.get_async_session() as session:
                 # Build query
-                query = select(TaskModel)
-                count_query = select(func.count(TaskModel.id))
-                
+                query = select(*_TASK_LIST_COLUMNS)
                 if status_filter:
                     query = query.where(TaskModel.status == status_filter)
-                    count_query = count_query.where(TaskModel.status == status_filter)
                 
-                # Get total count
-                total = await session.scalar(count_query) or 0
+                # Get paginated results; id breaks ties between equal timestamps
+                query = query.order_by(desc(TaskModel.created_at), desc(TaskModel.id))
+                if seek:
+                    query = query.where(
+                        tuple_(TaskModel.created_at, TaskModel.id) < tuple_(*seek)
+                    )
+                else:
+                    query = query.offset((page - 1) * per_page)
+                query = query.limit(per_page)
+                
+                # Plain column tuples; no ORM objects or identity map
+                rows = (await session.execute(query)).all()
                 
-                # Get paginated results
-                query = query.order_by(desc(TaskModel.created_at))
-                query = query.offset((page - 1) * per_page).limit(per_page)
+                total = self._cached_total(status_filter)
+                if total is None:
+                    # No recent totals; count from the table
+                    count_query = select(func.count(TaskModel.id))
+                    if status_filter:
+                        count_query = count_query.where(TaskModel.status == status_filter)
+                    total = await session.scalar(count_query) or 0
                 
-                result = await session.execute(query)
-                tasks = result.scalars().all()
+                task_list = [
+                    dict(zip(_TASK_LIST_FIELDS, (
+                        *row[:4], format_timestamp(row[4]), format_timestamp(row[5]), row[6]
+                    )))
+                    for row in rows
+                ]
                 
-                task_list = []
-                for task in tasks:
-                    task_dict = {
-                        "id": task.id,
-                        "directive": task.directive,
-                        "context": task.context,
-                        "status": task.status,
-                        "message": task.message,
-                        "result": task.result,
-                        "created_at": task.created_at.isoformat() if task.created_at else None,
-                        "completed_at": task.completed_at.isoformat() if task.completed_at else None,
-                        "processing_time": task.processing_time
-                    }
-                    task_list.append(task_dict)
+                next_cursor = None
+                if len(rows) == per_page:
+                    next_cursor = _encode_cursor(rows[-1][4], rows[-1][0])
                 
                 return {
                     "tasks": task_list,
                     "total": total,
                     "page": page,
-                    "per_page": per_page
+                    "per_page": per_page,
+                    "next_cursor": next_cursor
                 }
                 
         except Exception as e:
@@ -367,21 +847,69 @@ class AgentOrchestrator:
                 "tasks": [],
                 "total": 0,
                 "page": page,
-                "per_page": per_page
+                "per_page": per_page,
+                "next_cursor": None
             }
     
-    async def get_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
-        """Get the status of a task."""
-        task = self.tasks.get(task_id)
+    async def get_task_status(
+        self,
+        task_id: str,
+        await_completion: bool = False,
+        timeout: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Get the status of a task.
+        
+        If ``await_completion`` is set, wait (up to ``timeout`` seconds) for the
+        task to finish processing before reporting its status. On timeout the
+        current, unfinished status is returned.
+        """
+        task = self._in_flight.get(task_id)
         if not task:
-            return None
+            return await self._get_finished_task(task_id)
+        
+        if await_completion:
+            try:
+                await asyncio.wait_for(task.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
         
         return {
             "id": task.id,
             "directive": task.directive,
-            "status": task.status.value,
+            "status": _STATUS_VALUE[task.status],
             "message": task.message,
             "result": task.result,
-            "created_at": task.created_at,
-            "completed_at": task.completed_at
-        }
\ No newline at end of file
+            "created_at": format_timestamp(task.created_at),
+            "completed_at": format_timestamp(task.completed_at)
+        }
+    
+    async def _get_finished_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a finished task, reading through the in-memory TTL/LRU."""
+        now = time.monotonic()
+        cached = self._finished.get(task_id)
+        if cached is not None:
+            expires_at, status = cached
+            if expires_at > now:
+                self._finished.move_to_end(task_id)
+                return status
+            # Expired: re-read so changes made by other processes show up
+            del self._finished[task_id]
+        
+        status = await self._get_task_from_db(task_id)
+        # Only completed/failed rows are final; anything else may still change
+        if status and status["status"] in _FINAL_STATUS_VALUES:
+            self._finished[task_id] = (now + settings.task_cache_ttl, status)
+            if len(self._finished) > settings.task_cache_size:
+                self._finished.popitem(last=False)
+        return status
+    
+    async def _get_task_from_db(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Load a finished task from the database."""
+        try:
+            async with db_manager.get_async_session() as session:
+                db_task = await session.get(TaskModel, task_id)
+                return db_task.to_dict() if db_task else None
+                
+        except Exception as e:
+            self.logger.error(f"Failed to load task from database: {e}")
+            return None
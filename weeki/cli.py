@@ -40,6 +40,7 @@ def serve(host, port, debug, reload):
         host=settings.host,
         port=settings.port,
         reload=reload or settings.debug,
+        loop=settings.event_loop,
         log_level=settings.log_level.lower()
     )
 
@@ -58,9 +59,11 @@ def config():
     click.echo(f"  Host: {settings.host}")
     click.echo(f"  Port: {settings.port}")
     click.echo(f"  Debug: {settings.debug}")
+    click.echo(f"  Event Loop: {settings.event_loop}")
     click.echo(f"  Database URL: {settings.database_url}")
     click.echo(f"  Max Agents: {settings.max_agents}")
     click.echo(f"  Agent Timeout: {settings.agent_timeout}s")
+    click.echo(f"  Task Batch Size: {settings.task_batch_size}")
     click.echo(f"  Log Level: {settings.log_level}")
 
 
@@ -1,6 +1,6 @@
 """Configuration management for WeeKI."""
 
-from typing import Optional
+from typing import Literal, Optional
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -19,6 +19,10 @@ class Settings(BaseSettings):
     host: str = Field(default="0.0.0.0", description="Server host")
     port: int = Field(default=8000, description="Server port")
     debug: bool = Field(default=False, description="Debug mode")
+    event_loop: Literal["auto", "uvloop", "asyncio"] = Field(
+        default="auto",
+        description="Server event loop; auto uses uvloop when it is installed"
+    )
     
     # API configuration
     api_title: str = Field(default="WeeKI API", description="API title")
@@ -43,6 +47,22 @@ class Settings(BaseSettings):
     # Agent configuration
     max_agents: int = Field(default=10, description="Maximum number of concurrent agents")
     agent_timeout: int = Field(default=300, description="Agent timeout in seconds")
+    task_batch_size: int = Field(
+        default=4,
+        description="Maximum number of queued tasks a worker picks up at once"
+    )
+    task_cache_size: int = Field(
+        default=10000,
+        description="Number of finished tasks kept in memory for status lookups"
+    )
+    task_cache_ttl: float = Field(
+        default=30.0,
+        description="Seconds cached finished tasks and task totals are served before re-reading them"
+    )
+    sim_delay: Optional[float] = Field(
+        default=None,
+        description="Simulated agent work time in seconds (agent default if unset)"
+    )
     
     # External services
     openai_api_key: Optional[str] = Field(default=None, description="OpenAI API key")
@@ -1,24 +1,97 @@
 """Database models and setup for WeeKI."""
 
 import asyncio
-from datetime import datetime
+import json
+import re
+import time
+from datetime import datetime, timezone
 from typing import Optional, Dict, Any
+
+import orjson
 from sqlalchemy import (
-    create_engine, Column, String, Text, DateTime, Integer, 
-    Boolean, JSON, Float
+    event, inspect, text, Column, String, Text, DateTime, Integer, 
+    Boolean, JSON, Float, Index
 )
+from sqlalchemy.engine import Connection
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 
 from .config import settings
 
 Base = declarative_base()
 
+# Connection-level SQLite tuning: WAL lets readers run alongside the writer,
+# and synchronous=NORMAL only fsyncs at WAL checkpoints instead of per commit.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-64000",
+)
+
+
+def format_timestamp(timestamp: Optional[float]) -> Optional[str]:
+    """Render an epoch timestamp as an ISO 8601 UTC string."""
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
+
+
+def _json_serializer(value: Any) -> str:
+    """Serialize JSON columns with orjson (accepts non-str keys like json)."""
+    try:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+    except TypeError:
+        # orjson rejects what json still accepts, e.g. integers beyond 64 bits
+        return json.dumps(value)
+
+
+# A run of 19+ digits may be an integer orjson would read back as a float,
+# e.g. -9223372036854775809 just below the 64-bit minimum
+_LONG_NUMBER = re.compile(r"\d{19}")
+
+
+def _json_deserializer(value: str) -> Any:
+    """Parse JSON columns with orjson, keeping integers beyond 64 bits exact."""
+    if _LONG_NUMBER.search(value):
+        return json.loads(value)
+    return orjson.loads(value)
+
+
+def _pool_options(db_url: str) -> Dict[str, Any]:
+    """Connection pool settings for the configured database."""
+    if db_url.startswith("sqlite"):
+        # Keep SQLAlchemy's default pool: reusing connections keeps their page
+        # cache and mmap warm instead of reopening the file for every session
+        return {}
+    return {
+        "pool_size": settings.max_agents * 2,
+        "max_overflow": settings.max_agents,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True
+    }
+
+
+def _set_sqlite_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+    """Apply SQLITE_PRAGMAS to each new SQLite connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
 
 class Task(Base):
     """Task model for persistent storage."""
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Newest-first listing, optionally filtered by status
+        Index("ix_tasks_status_created", "status", "created_at"),
+        # Recent completions, e.g. the monitor's hourly processing-time average
+        Index("ix_tasks_status_completed", "status", "completed_at"),
+    )
     
     id = Column(String(36), primary_key=True)
     directive = Column(Text, nullable=False)
@@ -26,11 +99,91 @@ class Task(Base):
     status = Column(String(20), default="pending")
     message = Column(Text, default="")
     result = Column(JSON, default=dict)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    completed_at = Column(DateTime, nullable=True)
+    # Epoch seconds; formatted as ISO strings only when serialized
+    created_at = Column(Float, default=time.time, index=True)
+    completed_at = Column(Float, nullable=True)
     processing_time = Column(Float, nullable=True)
     assigned_agent = Column(String(100), nullable=True)
     
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the task row for API responses."""
+        return {
+            "id": self.id,
+            "directive": self.directive,
+            "context": self.context,
+            "status": self.status,
+            "message": self.message,
+            "result": self.result,
+            "created_at": format_timestamp(self.created_at),
+            "completed_at": format_timestamp(self.completed_at),
+            "processing_time": self.processing_time
+        }
+    
+
+# Task timestamps used to be DATETIME columns; they are now epoch seconds
+_TASK_TIMESTAMP_COLUMNS = ("created_at", "completed_at")
+
+
+def _upgrade_task_timestamps(connection: Connection) -> None:
+    """Convert a tasks table with DATETIME timestamps to epoch seconds.
+    
+    Databases created before timestamps were stored as floats keep their
+    rows; the old naive values are UTC. Runs when the tables are created
+    and does nothing once the table is converted.
+    """
+    inspector = inspect(connection)
+    if not inspector.has_table("tasks"):
+        return
+    column_types = {column["name"]: column["type"] for column in inspector.get_columns("tasks")}
+    if not isinstance(column_types["created_at"], DateTime):
+        return
+    
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        for column in _TASK_TIMESTAMP_COLUMNS:
+            connection.execute(text(
+                f"ALTER TABLE tasks ALTER COLUMN {column} TYPE DOUBLE PRECISION "
+                f"USING EXTRACT(EPOCH FROM {column})"
+            ))
+    elif dialect == "sqlite":
+        # SQLite cannot change a column's type; rebuild the table instead
+        connection.execute(text("ALTER TABLE tasks RENAME TO tasks_pre_epoch"))
+        old_indexes = connection.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' "
+            "AND tbl_name = 'tasks_pre_epoch' AND sql IS NOT NULL"
+        )).scalars().all()
+        for name in old_indexes:
+            connection.execute(text(f'DROP INDEX "{name}"'))
+        Task.__table__.create(connection)
+        
+        # Old values look like "YYYY-MM-DD HH:MM:SS.ffffff": whole seconds
+        # from strftime, plus the fraction after character 19
+        columns = [column.name for column in Task.__table__.columns]
+        values = [
+            f"CAST(strftime('%s', {name}) AS REAL) + CAST(substr({name}, 20) AS REAL)"
+            if name in _TASK_TIMESTAMP_COLUMNS else name
+            for name in columns
+        ]
+        connection.execute(text(
+            f"INSERT INTO tasks ({', '.join(columns)}) "
+            f"SELECT {', '.join(values)} FROM tasks_pre_epoch"
+        ))
+        connection.execute(text("DROP TABLE tasks_pre_epoch"))
+    else:
+        raise RuntimeError(
+            f"tasks.created_at and tasks.completed_at must be converted to epoch "
+            f"seconds by hand on {dialect}; see SELF_HOSTING.md"
+        )
+
+
+def _migrate(connection: Connection) -> None:
+    """Bring an existing schema up to date and create anything missing."""
+    _upgrade_task_timestamps(connection)
+    Base.metadata.create_all(connection)
+    # create_all skips existing tables, including indexes added to them later
+    for index in Task.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
 
 class Agent(Base):
     """Agent model for tracking agent state."""
@@ -64,9 +217,7 @@ class DatabaseManager:
     """Database connection and session management."""
     
     def __init__(self):
-        self.engine = None
         self.async_engine = None
-        self.SessionLocal = None
         self.AsyncSessionLocal = None
         
     def initialize(self):
@@ -78,44 +229,34 @@ class DatabaseManager:
         if db_url.startswith("sqlite:///"):
             async_db_url = db_url.replace("sqlite:///", "sqlite+aiosqlite:///")
         
-        # Synchronous engine
-        self.engine = create_engine(
-            db_url,
-            echo=settings.debug,
-            pool_pre_ping=True
-        )
+        pool_options = _pool_options(db_url)
         
-        # Asynchronous engine
+        # Asynchronous engine; every caller goes through async sessions
         self.async_engine = create_async_engine(
             async_db_url,
             echo=settings.debug,
-            pool_pre_ping=True
-        )
-        
-        # Session factories
-        self.SessionLocal = sessionmaker(
-            bind=self.engine,
-            autocommit=False,
-            autoflush=False
+            json_serializer=_json_serializer,
+            json_deserializer=_json_deserializer,
+            **pool_options
         )
         
+        # Session factory
         self.AsyncSessionLocal = async_sessionmaker(
             bind=self.async_engine,
             expire_on_commit=False
         )
+        
+        if db_url.startswith("sqlite"):
+            event.listen(self.async_engine.sync_engine, "connect", _set_sqlite_pragmas)
     
     def create_tables(self):
-        """Create all tables."""
-        Base.metadata.create_all(bind=self.engine)
+        """Create all tables from synchronous code."""
+        asyncio.run(self.create_tables_async())
     
     async def create_tables_async(self):
-        """Create all tables asynchronously."""
+        """Create all tables asynchronously, upgrading an older schema."""
         async with self.async_engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
-    
-    def get_session(self) -> Session:
-        """Get a synchronous database session."""
-        return self.SessionLocal()
+            await conn.run_sync(_migrate)
     
     def get_async_session(self):
         """Get an asynchronous database session."""
@@ -125,8 +266,6 @@ class DatabaseManager:
         """Close database connections."""
         if self.async_engine:
             await self.async_engine.dispose()
-        if self.engine:
-            self.engine.dispose()
 
 
 # Global database manager instance
@@ -2,12 +2,131 @@
 
 import asyncio
 import logging
+import random
+import time
 import psutil
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select, insert, func, and_, desc, bindparam, true
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .database import db_manager, SystemMetrics, Task, Agent
 
+# The collection interval doubles while nothing changes or collection fails,
+# up to this multiple of the base interval
+MAX_INTERVAL_FACTOR = 8
+# Each delay is randomized by this fraction so replicas don't poll in lockstep
+INTERVAL_JITTER = 0.2
+
+# Collected metrics rows are written in batches: once this many are pending,
+# or the oldest has waited this many seconds. At most METRICS_MAX_PENDING
+# rows are kept while the database is unavailable.
+METRICS_FLUSH_SIZE = 5
+METRICS_FLUSH_INTERVAL = 300
+METRICS_MAX_PENDING = 1000
+
+# Seconds over which each collection cycle samples CPU usage
+CPU_SAMPLE_SECONDS = 1
+
+# Seconds stop_monitoring waits for a cancelled collection cycle to unwind
+STOP_TIMEOUT = 5
+
+
+def _jittered(delay: float) -> float:
+    """Spread a delay by up to INTERVAL_JITTER in either direction."""
+    return delay * random.uniform(1 - INTERVAL_JITTER, 1 + INTERVAL_JITTER)
+
+
+# Statements for the monitoring queries, built once so every tick reuses
+# SQLAlchemy's compiled form; values that change are bound parameters
+
+# The whole live status in one row: task counts by conditional aggregation,
+# agent counts the same way, the average processing time of tasks completed
+# since :since, and the latest metrics row if there is one
+_task_counts = select(
+    func.count(Task.id).filter(Task.status == "pending").label("pending"),
+    func.count(Task.id).filter(Task.status == "completed").label("completed"),
+    func.count(Task.id).filter(Task.status == "failed").label("failed"),
+    func.count(Task.id).label("total")
+).cte("task_counts")
+_agent_counts = select(
+    func.count(Agent.id).filter(Agent.is_active == True).label("active"),
+    func.count(Agent.id).label("registered")
+).cte("agent_counts")
+_latest_metrics = (
+    select(SystemMetrics.timestamp, SystemMetrics.avg_processing_time)
+    .order_by(desc(SystemMetrics.timestamp))
+    .limit(1)
+    .cte("latest_metrics")
+)
+_recent_processing_time = (
+    select(func.avg(Task.processing_time))
+    .where(
+        and_(
+            Task.status == "completed",
+            Task.completed_at >= bindparam("since")
+        )
+    )
+    .scalar_subquery()
+    .label("recent_processing_time")
+)
+LIVE_STATUS_STMT = select(
+    _task_counts, _agent_counts, _recent_processing_time,
+    _latest_metrics.c.timestamp, _latest_metrics.c.avg_processing_time
+).select_from(
+    _task_counts
+    .join(_agent_counts, true())
+    .outerjoin(_latest_metrics, true())
+)
+# The same without the latest metrics row, for the collection tick: it
+# publishes the row it just collected, and finding the latest one sorts the
+# whole system_metrics table
+LIVE_COUNTS_STMT = select(
+    _task_counts, _agent_counts, _recent_processing_time
+).select_from(
+    _task_counts.join(_agent_counts, true())
+)
+
+
+def _processing_time_since() -> float:
+    """Cutoff for the processing-time average: one hour ago.
+    
+    completed_at is stored as epoch seconds.
+    """
+    return time.time() - 3600
+
+
+class ResourceSnapshot(NamedTuple):
+    """System resource readings taken together."""
+    cpu_percent: float
+    memory: Any
+    disk: Any
+
+
+def _read_resources() -> ResourceSnapshot:
+    """Read CPU, memory and disk usage now.
+    
+    CPU usage covers the time since the previous reading.
+    """
+    return ResourceSnapshot(
+        psutil.cpu_percent(interval=None),
+        psutil.virtual_memory(),
+        psutil.disk_usage('/')
+    )
+
+
+def _system_status(resources: ResourceSnapshot) -> Dict[str, Any]:
+    """The ``system`` section of a status snapshot."""
+    memory, disk = resources.memory, resources.disk
+    return {
+        "cpu_percent": resources.cpu_percent,
+        "memory_percent": memory.percent,
+        "memory_available_gb": round(memory.available / (1024**3), 2),
+        "disk_percent": disk.percent,
+        "disk_free_gb": round(disk.free / (1024**3), 2)
+    }
+
 
 class SystemMonitor:
     """System monitoring and metrics collection."""
@@ -16,160 +135,294 @@ class SystemMonitor:
         self.logger = logging.getLogger("monitor")
         self._monitoring_task: Optional[asyncio.Task] = None
         self._stop_monitoring = False
+        # Status snapshot published by each collection cycle
+        self._latest_status: Optional[Dict[str, Any]] = None
+        # Replaced and set each time a new snapshot is published; created
+        # lazily so it belongs to the running loop
+        self._status_published: Optional[asyncio.Event] = None
+        # Metrics rows waiting to be inserted, oldest first
+        self._pending_metrics: List[Dict[str, Any]] = []
+        self._pending_since = 0.0
+        # Monotonic time the status snapshot is next refreshed, once scheduled
+        self._next_collection_at: Optional[float] = None
     
-    async def start_monitoring(self, interval: int = 60):
-        """Start system monitoring."""
+    async def start_monitoring(self, interval: int = 60, max_interval: Optional[int] = None) -> None:
+        """Start system monitoring.
+        
+        Metrics are collected every ``interval`` seconds while task and agent
+        counts change. When they stay the same, or collection fails, the
+        delay doubles up to ``max_interval``, which defaults to
+        ``MAX_INTERVAL_FACTOR * interval``. The CPU, memory and disk readings
+        of the status snapshot are still refreshed every ``interval``.
+        """
         self.logger.info(f"Starting system monitoring with {interval}s interval")
         self._stop_monitoring = False
-        self._monitoring_task = asyncio.create_task(self._monitor_loop(interval))
+        if max_interval is None:
+            max_interval = interval * MAX_INTERVAL_FACTOR
+        self._monitoring_task = asyncio.create_task(self._monitor_loop(interval, max_interval))
     
     async def stop_monitoring(self):
         """Stop system monitoring."""
         self.logger.info("Stopping system monitoring")
         self._stop_monitoring = True
+        # Release status stream subscribers; no snapshot will follow
+        self._wake_status_waiters()
         if self._monitoring_task:
             self._monitoring_task.cancel()
             try:
-                await self._monitoring_task
-            except asyncio.CancelledError:
+                # A cycle stuck in a slow query must not hold up shutdown
+                await asyncio.wait_for(self._monitoring_task, timeout=STOP_TIMEOUT)
+            except (asyncio.CancelledError, asyncio.TimeoutError):
                 pass
+        
+        # Store whatever the last batch had not written yet
+        try:
+            async with db_manager.get_async_session() as session:
+                await self._flush_metrics(session)
+        except Exception as e:
+            self.logger.error(f"Failed to write pending metrics: {e}")
     
-    async def _monitor_loop(self, interval: int):
+    async def _monitor_loop(self, interval: int, max_interval: int) -> None:
         """Main monitoring loop."""
+        delay = interval
+        previous: Optional[Tuple[int, int, int, int]] = None
         while not self._stop_monitoring:
             try:
-                await self._collect_metrics()
-                await asyncio.sleep(interval)
+                # A slow cycle is abandoned rather than overlapping the next;
+                # its queries get the interval on top of the CPU sample
+                timeout = CPU_SAMPLE_SECONDS + interval
+                try:
+                    current = await asyncio.wait_for(self._collect_metrics(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    self.logger.error(f"Metrics collection timed out after {timeout}s")
+                    current = None
+                if current is None or current == previous:
+                    # Failed or idle: back off
+                    delay = min(delay * 2, max_interval)
+                else:
+                    delay = interval
+                previous = current
+                await self._sleep_until_next(_jittered(delay), interval)
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 self.logger.error(f"Error in monitoring loop: {e}")
-                await asyncio.sleep(interval)
+                delay = min(delay * 2, max_interval)
+                await self._sleep_until_next(_jittered(delay), interval)
+    
+    async def _sleep_until_next(self, delay: float, probe_interval: float) -> None:
+        """Sleep until the next collection cycle.
+        
+        Backed-off waits are split into ``probe_interval`` steps, each
+        refreshing the resource readings of the latest snapshot.
+        """
+        collect_at = time.monotonic() + delay
+        while True:
+            remaining = collect_at - time.monotonic()
+            step = min(remaining, probe_interval)
+            self._next_collection_at = time.monotonic() + step
+            await asyncio.sleep(step)
+            if remaining <= probe_interval:
+                return
+            self._refresh_resources()
+    
+    def _refresh_resources(self) -> None:
+        """Republish the latest snapshot with current resource readings."""
+        if self._latest_status is None:
+            return
+        status = dict(self._latest_status)
+        status["timestamp"] = datetime.utcnow().isoformat()
+        status["system"] = _system_status(_read_resources())
+        self._publish_status(status)
     
-    async def _collect_metrics(self):
-        """Collect and store system metrics."""
+    def seconds_until_next_collection(self) -> float:
+        """Seconds until the status snapshot is next refreshed, 0 if unknown."""
+        if self._next_collection_at is None:
+            return 0.0
+        return max(0.0, self._next_collection_at - time.monotonic())
+    
+    async def _collect_metrics(self) -> Optional[Tuple[int, int, int, int]]:
+        """Collect and store system metrics.
+        
+        Returns the (active agents, pending, completed, failed) counts, or
+        None if collection failed.
+        """
         try:
+            # Sample CPU over one second without blocking the event loop
+            psutil.cpu_percent(interval=None)
+            await asyncio.sleep(CPU_SAMPLE_SECONDS)
+            resources = _read_resources()
+            cpu_percent = resources.cpu_percent
+            
             async with db_manager.get_async_session() as session:
-                # Get task statistics
-                from sqlalchemy import select, func, and_
+                # Task and agent counts and the average processing time of
+                # tasks completed in the last hour, in one round-trip
+                live = (await session.execute(
+                    LIVE_COUNTS_STMT, {"since": _processing_time_since()}
+                )).one()
+                counts = {
+                    "pending": live.pending,
+                    "completed": live.completed,
+                    "failed": live.failed
+                }
+                active_agents = live.active or 0
+                avg_processing_time = live.recent_processing_time
                 
-                # Count tasks by status
-                pending_count = await session.scalar(
-                    select(func.count(Task.id)).where(Task.status == "pending")
-                ) or 0
+                memory_percent = resources.memory.percent
                 
-                completed_count = await session.scalar(
-                    select(func.count(Task.id)).where(Task.status == "completed")
-                ) or 0
+                # Queue the metrics record; rows are inserted in batches
+                row = {
+                    "timestamp": datetime.utcnow(),
+                    "active_agents": active_agents,
+                    "pending_tasks": live.pending,
+                    "completed_tasks": live.completed,
+                    "failed_tasks": live.failed,
+                    "avg_processing_time": float(avg_processing_time) if avg_processing_time else None,
+                    "memory_usage": memory_percent,
+                    "cpu_usage": cpu_percent
+                }
+                if not self._pending_metrics:
+                    self._pending_since = time.monotonic()
+                self._pending_metrics.append(row)
+                del self._pending_metrics[:-METRICS_MAX_PENDING]
                 
-                failed_count = await session.scalar(
-                    select(func.count(Task.id)).where(Task.status == "failed")
-                ) or 0
+                # Unsaved record, only read for the status snapshot
+                metrics = SystemMetrics(**row)
                 
-                # Get active agents count
-                active_agents = await session.scalar(
-                    select(func.count(Agent.id)).where(Agent.is_active == True)
-                ) or 0
+                self._publish_status(self._build_status(
+                    counts, live.total, active_agents, live.registered,
+                    resources, metrics
+                ))
                 
-                # Calculate average processing time for completed tasks in last hour
-                one_hour_ago = datetime.utcnow().replace(microsecond=0)
-                one_hour_ago = one_hour_ago.replace(
-                    hour=one_hour_ago.hour - 1 if one_hour_ago.hour > 0 else 23
-                )
+                if (len(self._pending_metrics) >= METRICS_FLUSH_SIZE
+                        or time.monotonic() - self._pending_since >= METRICS_FLUSH_INTERVAL):
+                    # Rows stay queued for the next attempt; the cycle itself succeeded
+                    try:
+                        await self._flush_metrics(session)
+                    except Exception as e:
+                        self.logger.error(f"Failed to write pending metrics: {e}")
                 
-                avg_processing_time = await session.scalar(
-                    select(func.avg(Task.processing_time)).where(
-                        and_(
-                            Task.status == "completed",
-                            Task.completed_at >= one_hour_ago
-                        )
-                    )
+                self.logger.debug(
+                    "Collected metrics: agents=%s, pending=%s, completed=%s, "
+                    "failed=%s, cpu=%s%%, memory=%s%%",
+                    active_agents, live.pending, live.completed,
+                    live.failed, cpu_percent, memory_percent
                 )
                 
-                # Get system resource usage
-                cpu_percent = psutil.cpu_percent(interval=1)
-                memory = psutil.virtual_memory()
-                memory_percent = memory.percent
-                
-                # Create metrics record
-                metrics = SystemMetrics(
-                    active_agents=active_agents,
-                    pending_tasks=pending_count,
-                    completed_tasks=completed_count,
-                    failed_tasks=failed_count,
-                    avg_processing_time=float(avg_processing_time) if avg_processing_time else None,
-                    memory_usage=memory_percent,
-                    cpu_usage=cpu_percent
-                )
-                
-                session.add(metrics)
-                await session.commit()
-                
-                self.logger.debug(f"Collected metrics: agents={active_agents}, "
-                                f"pending={pending_count}, completed={completed_count}, "
-                                f"failed={failed_count}, cpu={cpu_percent}%, "
-                                f"memory={memory_percent}%")
+                return active_agents, live.pending, live.completed, live.failed
                 
         except Exception as e:
             self.logger.error(f"Failed to collect metrics: {e}")
+            return None
+    
+    async def _flush_metrics(self, session: AsyncSession) -> None:
+        """Insert all pending metrics rows with one executemany and commit.
+        
+        The rows are taken off the pending list first, so a cycle cancelled
+        after the commit never inserts them again; they are only put back
+        if the insert fails.
+        """
+        if not self._pending_metrics:
+            return
+        rows, self._pending_metrics = self._pending_metrics, []
+        try:
+            await session.execute(insert(SystemMetrics), rows)
+            await session.commit()
+        except Exception:
+            self._pending_metrics[:0] = rows
+            raise
+    
+    def _publish_status(self, status: Dict[str, Any]) -> None:
+        """Store a new status snapshot and wake everyone waiting for one."""
+        self._latest_status = status
+        self._wake_status_waiters()
+    
+    def _wake_status_waiters(self) -> None:
+        """Wake every wait_for_status caller."""
+        published, self._status_published = self._status_published, None
+        if published is not None:
+            published.set()
+    
+    async def wait_for_status(self) -> Optional[Dict[str, Any]]:
+        """Wait until the next collection cycle publishes a status snapshot.
+        
+        Returns None once monitoring has been stopped.
+        """
+        if self._stop_monitoring:
+            return None
+        if self._status_published is None:
+            self._status_published = asyncio.Event()
+        await self._status_published.wait()
+        return None if self._stop_monitoring else self._latest_status
+    
+    def _build_status(
+        self,
+        counts: Dict[str, int],
+        total_tasks: int,
+        active_agents: int,
+        registered_agents: int,
+        resources: ResourceSnapshot,
+        latest_metrics: Optional[SystemMetrics]
+    ) -> Dict[str, Any]:
+        """Assemble a system status dict from collected values."""
+        status = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "system": _system_status(resources),
+            "agents": {
+                "active": active_agents or 0,
+                "total_registered": registered_agents or 0
+            },
+            "tasks": {
+                "total": total_tasks,
+                "pending": counts.get("pending", 0),
+                "completed": counts.get("completed", 0),
+                "failed": counts.get("failed", 0)
+            }
+        }
+        
+        if latest_metrics:
+            status["metrics"] = {
+                "last_updated": latest_metrics.timestamp.isoformat(),
+                "avg_processing_time": latest_metrics.avg_processing_time
+            }
+        
+        return status
     
     async def get_system_status(self) -> Dict[str, Any]:
-        """Get current system status."""
+        """Get current system status.
+        
+        Served from the snapshot of the latest monitoring cycle; the database
+        is only queried before the first cycle has completed.
+        """
+        if self._latest_status is not None:
+            return self._latest_status
+        return await self._fetch_system_status()
+    
+    async def _fetch_system_status(self) -> Dict[str, Any]:
+        """Query the current system status directly."""
         try:
             async with db_manager.get_async_session() as session:
-                from sqlalchemy import select, func, desc
-                
-                # Get latest metrics
-                latest_metrics = await session.scalar(
-                    select(SystemMetrics).order_by(desc(SystemMetrics.timestamp)).limit(1)
-                )
-                
-                # Get task counts
-                total_tasks = await session.scalar(select(func.count(Task.id))) or 0
-                pending_tasks = await session.scalar(
-                    select(func.count(Task.id)).where(Task.status == "pending")
-                ) or 0
-                active_agents = await session.scalar(
-                    select(func.count(Agent.id)).where(Agent.is_active == True)
-                ) or 0
+                row = (await session.execute(
+                    LIVE_STATUS_STMT, {"since": _processing_time_since()}
+                )).one()
                 
-                # System resources
-                cpu_percent = psutil.cpu_percent()
-                memory = psutil.virtual_memory()
-                disk = psutil.disk_usage('/')
+                latest_metrics = None
+                if row.timestamp is not None:
+                    # Unsaved record, only read for the status snapshot
+                    latest_metrics = SystemMetrics(
+                        timestamp=row.timestamp,
+                        avg_processing_time=row.avg_processing_time
+                    )
                 
-                status = {
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "system": {
-                        "cpu_percent": cpu_percent,
-                        "memory_percent": memory.percent,
-                        "memory_available_gb": round(memory.available / (1024**3), 2),
-                        "disk_percent": disk.percent,
-                        "disk_free_gb": round(disk.free / (1024**3), 2)
-                    },
-                    "agents": {
-                        "active": active_agents,
-                        "total_registered": await session.scalar(select(func.count(Agent.id))) or 0
-                    },
-                    "tasks": {
-                        "total": total_tasks,
-                        "pending": pending_tasks,
-                        "completed": await session.scalar(
-                            select(func.count(Task.id)).where(Task.status == "completed")
-                        ) or 0,
-                        "failed": await session.scalar(
-                            select(func.count(Task.id)).where(Task.status == "failed")
-                        ) or 0
-                    }
+                counts = {
+                    "pending": row.pending,
+                    "completed": row.completed,
+                    "failed": row.failed
                 }
-                
-                if latest_metrics:
-                    status["metrics"] = {
-                        "last_updated": latest_metrics.timestamp.isoformat(),
-                        "avg_processing_time": latest_metrics.avg_processing_time
-                    }
-                
-                return status
+                return self._build_status(
+                    counts, row.total, row.active, row.registered,
+                    _read_resources(), latest_metrics
+                )
                 
         except Exception as e:
             self.logger.error(f"Failed to get system status: {e}")
@@ -1,12 +1,17 @@
 """FastAPI server for WeeKI agent orchestration system."""
 
+import asyncio
 import logging
+import logging.handlers
+import queue
 from contextlib import asynccontextmanager
 from typing import Dict, Any, List, Optional
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from .config import settings
 from .agents import AgentOrchestrator
@@ -14,6 +19,11 @@ from .database import db_manager
 from .monitoring import system_monitor
 
 
+# Response models are built from trusted internal data with model_construct
+# and never modified afterwards
+_RESPONSE_CONFIG = ConfigDict(extra="ignore", frozen=True)
+
+
 # Request/Response models
 class TaskRequest(BaseModel):
     """Task request model."""
@@ -23,6 +33,8 @@ class TaskRequest(BaseModel):
 
 class TaskResponse(BaseModel):
     """Task response model."""
+    model_config = _RESPONSE_CONFIG
+    
     task_id: str
     status: str
     message: str
@@ -34,6 +46,8 @@ class TaskResponse(BaseModel):
 
 class HealthResponse(BaseModel):
     """Health check response model."""
+    model_config = _RESPONSE_CONFIG
+    
     status: str
     version: str
     agents_active: int
@@ -41,6 +55,8 @@ class HealthResponse(BaseModel):
 
 class SystemStatusResponse(BaseModel):
     """System status response model."""
+    model_config = _RESPONSE_CONFIG
+    
     timestamp: str
     system: Dict[str, Any]
     agents: Dict[str, Any]
@@ -50,49 +66,91 @@ class SystemStatusResponse(BaseModel):
 
 class TaskListResponse(BaseModel):
     """Task list response model."""
+    model_config = _RESPONSE_CONFIG
+    
     tasks: List[TaskResponse]
     total: int
     page: int
     per_page: int
+    next_cursor: Optional[str] = None
+
+
+# Cache-Control max-age, in seconds, for the cacheable read endpoints.
+# /status is cached until the monitor's next snapshot instead.
+HEALTH_MAX_AGE = 5
+ROOT_MAX_AGE = 3600
 
 
 # Global orchestrator instance
 orchestrator: AgentOrchestrator = None
 
 
+def _start_log_listener() -> Optional[logging.handlers.QueueListener]:
+    """Route root logging through a queue so handler I/O runs off the event loop.
+    
+    Like ``logging.basicConfig``, this leaves an already configured root
+    logger alone and returns None.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+    root.setLevel(getattr(logging, settings.log_level.upper()))
+    
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(settings.log_format))
+    
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def _stop_log_listener(listener: Optional[logging.handlers.QueueListener]) -> None:
+    """Flush queued records and restore direct logging."""
+    if listener is None:
+        return
+    listener.stop()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler) and handler.queue is listener.queue:
+            root.removeHandler(handler)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager."""
     global orchestrator
     
     # Startup
-    logging.basicConfig(
-        level=getattr(logging, settings.log_level.upper()),
-        format=settings.log_format
-    )
+    log_listener = _start_log_listener()
     logger = logging.getLogger(__name__)
     logger.info("Starting WeeKI agent orchestration system...")
     
-    # Initialize database
+    # Create tables while the agents come up; no task is written before
+    # the app starts serving
     db_manager.initialize()
-    await db_manager.create_tables_async()
-    logger.info("Database initialized")
-    
-    # Initialize orchestrator
     orchestrator = AgentOrchestrator()
-    await orchestrator.initialize()
+    await asyncio.gather(db_manager.create_tables_async(), orchestrator.initialize())
+    logger.info("Database and orchestrator initialized")
     
-    # Start monitoring
+    # Start monitoring once the tables exist
     await system_monitor.start_monitoring(interval=60)
     
     yield
     
     # Shutdown
     logger.info("Shutting down WeeKI agent orchestration system...")
-    if orchestrator:
-        await orchestrator.shutdown()
-    await system_monitor.stop_monitoring()
+    results = await asyncio.gather(
+        orchestrator.shutdown() if orchestrator else asyncio.sleep(0),
+        system_monitor.stop_monitoring(),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Error during shutdown: {result}")
     await db_manager.close()
+    _stop_log_listener(log_listener)
 
 
 # Create FastAPI app
@@ -104,6 +162,44 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+
+class _UnhandledErrorMiddleware:
+    """Answer any unhandled endpoint error with a 500 and its message.
+    
+    Added before CORSMiddleware so it runs inside it and these responses
+    keep their CORS headers; the error is logged here, once.
+    """
+    
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        response_started = False
+        
+        async def send_tracking_start(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_tracking_start)
+        except Exception as exc:
+            if response_started:
+                raise
+            logging.getLogger(__name__).error(
+                "Unhandled error on %s %s: %s", scope["method"], scope["path"], exc,
+                exc_info=exc
+            )
+            await JSONResponse(status_code=500, content={"detail": str(exc)})(scope, receive, send)
+
+
+app.add_middleware(_UnhandledErrorMiddleware)
+
 # Add CORS middleware for self-hosting scenarios
 app.add_middleware(
     CORSMiddleware,
@@ -115,13 +211,14 @@ app.add_middleware(
 
 
 @app.get("/health", response_model=HealthResponse)
-async def health_check():
+async def health_check(response: Response):
     """Health check endpoint."""
+    response.headers["Cache-Control"] = f"public, max-age={HEALTH_MAX_AGE}"
     active_agents = 0
     if orchestrator:
         active_agents = orchestrator.get_active_agent_count()
     
-    return HealthResponse(
+    return HealthResponse.model_construct(
         status="healthy",
         version=settings.api_version,
         agents_active=active_agents
@@ -129,27 +226,67 @@ async def health_check():
 
 
 @app.get("/status", response_model=SystemStatusResponse)
-async def system_status():
+async def system_status(response: Response):
     """Get detailed system status."""
     status = await system_monitor.get_system_status()
+    # Proxies may reuse the snapshot until the monitor replaces it
+    max_age = int(system_monitor.seconds_until_next_collection())
+    response.headers["Cache-Control"] = f"public, max-age={max_age}"
     return SystemStatusResponse(**status)
 
 
+@app.websocket("/status/stream")
+async def system_status_stream(websocket: WebSocket) -> None:
+    """Push the system status to the client after every monitoring cycle.
+    
+    The current status is sent on connect. Each later message is the
+    snapshot the monitor has just collected, shared by all subscribers.
+    """
+    await websocket.accept()
+    await websocket.send_json(await system_monitor.get_system_status())
+    
+    # Listen to the client while waiting, so a close is noticed right away
+    # instead of at the next snapshot; client messages are ignored
+    receive = asyncio.ensure_future(websocket.receive())
+    published = asyncio.ensure_future(system_monitor.wait_for_status())
+    try:
+        while True:
+            done, _ = await asyncio.wait(
+                (receive, published), return_when=asyncio.FIRST_COMPLETED
+            )
+            
+            if receive in done:
+                if receive.result()["type"] == "websocket.disconnect":
+                    return
+                receive = asyncio.ensure_future(websocket.receive())
+            
+            if published in done:
+                status = published.result()
+                if status is None:
+                    # Monitoring stopped; the server is shutting down
+                    await websocket.close(code=1001)
+                    return
+                await websocket.send_json(status)
+                published = asyncio.ensure_future(system_monitor.wait_for_status())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receive.cancel()
+        published.cancel()
+
+
 @app.post("/tasks", response_model=TaskResponse)
 async def create_task(request: TaskRequest):
     """Create a new task for the agent orchestrator."""
     if not orchestrator:
         raise HTTPException(status_code=503, detail="Orchestrator not initialized")
     
-    try:
-        task_id = await orchestrator.create_task(request.directive, request.context)
-        return TaskResponse(
-            task_id=task_id,
-            status="created",
-            message="Task created successfully"
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to create task: {str(e)}")
+    task_id = await orchestrator.create_task(request.directive, request.context)
+    return TaskResponse.model_construct(
+        task_id=task_id,
+        status="created",
+        message="Task created successfully"
+    )
 
 
 @app.get("/tasks/{task_id}", response_model=TaskResponse)
@@ -158,65 +295,58 @@ async def get_task_status(task_id: str):
     if not orchestrator:
         raise HTTPException(status_code=503, detail="Orchestrator not initialized")
     
-    try:
-        task_status = await orchestrator.get_task_status(task_id)
-        if not task_status:
-            raise HTTPException(status_code=404, detail="Task not found")
-        
-        return TaskResponse(
-            task_id=task_id,
-            status=task_status["status"],
-            message=task_status.get("message", ""),
-            result=task_status.get("result", {}),
-            created_at=task_status.get("created_at"),
-            completed_at=task_status.get("completed_at"),
-            processing_time=task_status.get("processing_time")
-        )
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get task status: {str(e)}")
+    task_status = await orchestrator.get_task_status(task_id)
+    if not task_status:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    return TaskResponse.model_construct(
+        task_id=task_id,
+        status=task_status["status"],
+        message=task_status.get("message", ""),
+        result=task_status.get("result", {}),
+        created_at=task_status.get("created_at"),
+        completed_at=task_status.get("completed_at"),
+        processing_time=task_status.get("processing_time")
+    )
 
 
 @app.get("/tasks", response_model=TaskListResponse)
 async def list_tasks(
     page: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(10, ge=1, le=100, description="Items per page"),
-    status: Optional[str] = Query(None, description="Filter by status")
+    status: Optional[str] = Query(None, description="Filter by status"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; overrides page")
 ):
-    """List tasks with pagination."""
+    """List tasks with pagination.
+    
+    Pass the previous response's ``next_cursor`` to fetch the next page with
+    a keyset seek, which stays fast however deep the page.
+    """
     if not orchestrator:
         raise HTTPException(status_code=503, detail="Orchestrator not initialized")
     
     try:
-        tasks_data = await orchestrator.list_tasks(page, per_page, status)
-        
-        tasks = [
-            TaskResponse(
-                task_id=task["id"],
-                status=task["status"],
-                message=task.get("message", ""),
-                result=task.get("result", {}),
-                created_at=task.get("created_at"),
-                completed_at=task.get("completed_at"),
-                processing_time=task.get("processing_time")
-            )
-            for task in tasks_data["tasks"]
-        ]
-        
-        return TaskListResponse(
-            tasks=tasks,
-            total=tasks_data["total"],
-            page=page,
-            per_page=per_page
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to list tasks: {str(e)}")
+        tasks_data = await orchestrator.list_tasks(page, per_page, status, cursor)
+    except ValueError as e:
+        # Malformed cursor
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Rows are already shaped as TaskResponse fields
+    tasks = [TaskResponse.model_construct(**task) for task in tasks_data["tasks"]]
+    
+    return TaskListResponse.model_construct(
+        tasks=tasks,
+        total=tasks_data["total"],
+        page=page,
+        per_page=per_page,
+        next_cursor=tasks_data["next_cursor"]
+    )
 
 
 @app.get("/")
-async def root():
+async def root(response: Response):
     """Root endpoint with basic information."""
+    response.headers["Cache-Control"] = f"public, max-age={ROOT_MAX_AGE}"
     return {
         "message": "WeeKI - Wee, Kunstig Intelligens",
         "description": "AI Agent Orchestration System",